@@ -8,6 +8,7 @@ import time
 import pytest
 
 import instaseis
+import instaseis.database_interfaces
 
 
 TEST_DATA = os.path.join(os.path.dirname(__file__), "tests", "data")
@@ -344,6 +345,10 @@ def is_master(config):
 
 
 def pytest_configure(config):
+    # Never write layout caches into the test databases - all later test
+    # runs would then no longer search for the database files.
+    instaseis.database_interfaces.USE_LAYOUT_CACHE = False
+
     if is_master(config):
         config.dbs = repack_databases()
     else:  # pragma: no cover
@@ -7,8 +7,11 @@
     GNU Lesser General Public License, Version 3 [non-commercial/academic use]
     (http://www.gnu.org/copyleft/lgpl.html)
 """
-import collections
+import io
+import json
 import os
+import tempfile
+import time
 
 import h5py
 
@@ -18,6 +21,261 @@ from .forward_merged_instaseis_db import ForwardMergedInstaseisDB
 from .reciprocal_instaseis_db import ReciprocalInstaseisDB
 from .reciprocal_merged_instaseis_db import ReciprocalMergedInstaseisDB
 
+NETCDF_FILENAMES = (
+    "ordered_output.nc4",
+    "axisem_output.nc4",
+    "merged_output.nc4",
+)
+
+# Name of the file caching the location of the netCDF files of a database.
+LAYOUT_CACHE_FILENAME = ".instaseis_layout.json"
+# Set to False to always search for the netCDF files and never write the
+# cache.
+USE_LAYOUT_CACHE = True
+
+# Folders containing the netCDF file for each component of a database.
+COMPONENT_FOLDERS = frozenset(
+    ("PX", "PZ", "MZZ", "MXX_P_MYY", "MXZ_MYZ", "MXY_MXX_M_MYY")
+)
+
+
+def _get_subfolder_state(name, depth, in_component):
+    """
+    Decide whether a subfolder is searched for netCDF files.
+
+    :param name: The name of the subfolder.
+    :param depth: The depth of the parent folder below the searched path.
+    :param in_component: True if the parent folder is or is below a
+        component folder.
+
+    Returns None if the subfolder is not searched. Otherwise returns True if
+    the subfolder is or is below a component folder.
+    """
+    # Limit depth of filetree traversal - files up to four folders below
+    # the searched path are found - and never enter hidden folders.
+    if depth >= 4 or name.startswith("."):
+        return None
+    # The netCDF file of a component is either directly in the component
+    # folder or in its 'Data' subfolder. Merged databases are never below
+    # a component folder so nothing else has to be searched there.
+    if in_component:
+        return True if name == "Data" else None
+    return name in COMPONENT_FOLDERS
+
+
+def _find_netcdf_files_scandir(path):
+    """
+    Recursively search path for the netCDF files of an Instaseis database.
+
+    Returns a list with the full path of each found file and a dictionary
+    with the modification time in nanoseconds of each searched folder.
+    """
+    found_files = []
+    folder_mtimes = {}
+    # Iterative depth-first search - the depth is tracked alongside each
+    # directory so no path arithmetic is required to limit it. The third
+    # item is True if the folder is or is below a component folder. The
+    # modification time is taken before the folder is listed.
+    stack = []
+    # Device, inode, and component state of all folders already searched or
+    # about to be searched - symbolic links are followed so the same folder
+    # might be reachable in more than one way. The component state is part
+    # of the key as it decides which subfolders are searched and which
+    # component a file belongs to.
+    visited = set()
+    try:
+        st = os.stat(path)
+        visited.add((st.st_dev, st.st_ino, False))
+        stack.append((path, 0, False, st.st_mtime_ns))
+    except OSError:
+        pass
+    while stack:
+        directory, depth, in_component, mtime = stack.pop()
+        filenames = []
+        try:
+            it = os.scandir(directory)
+        except OSError:
+            # Silently skip unreadable folders just like os.walk() does.
+            continue
+        folder_mtimes[directory] = mtime
+        with it:
+            for entry in it:
+                name = entry.name
+                if name in NETCDF_FILENAMES and entry.is_file():
+                    filenames.append(name)
+                    continue
+                state = _get_subfolder_state(name, depth, in_component)
+                if state is None:
+                    continue
+                if not entry.is_dir(follow_symlinks=True):
+                    continue
+                # DirEntry.stat() does not provide the device and inode on
+                # Windows.
+                try:
+                    st = os.stat(entry.path)
+                except OSError:
+                    continue
+                key = (st.st_dev, st.st_ino, state)
+                if key in visited:
+                    continue
+                visited.add(key)
+                stack.append((entry.path, depth + 1, state, st.st_mtime_ns))
+        if not filenames:
+            continue
+        # At most one file per folder.
+        found_files.append(
+            os.path.join(directory, sorted(filenames, reverse=True)[0])
+        )
+
+    return found_files, folder_mtimes
+
+
+def _find_netcdf_files_fwalk(path):
+    """
+    Same as _find_netcdf_files_scandir() but based on os.fwalk().
+
+    Sub folders are opened relative to the file descriptor of their parent
+    folder and already searched folders are identified with fstat() on the
+    open file descriptor, so no full paths have to be resolved.
+    """
+    found_files = []
+    folder_mtimes = {}
+    # Unlike os.scandir(), os.fwalk() raises if path is not an existing
+    # folder.
+    if not os.path.isdir(path):
+        return found_files, folder_mtimes
+    # Depth and whether the folder is or is below a component folder for
+    # all folders about to be searched.
+    folders = {path: (0, False)}
+    # Device, inode, and component state of all folders already searched -
+    # see _find_netcdf_files_scandir().
+    visited = set()
+    for directory, dirnames, filenames, dirfd in os.fwalk(
+        path, follow_symlinks=True
+    ):
+        depth, in_component = folders.pop(directory)
+        st = os.fstat(dirfd)
+        key = (st.st_dev, st.st_ino, in_component)
+        if key in visited:
+            del dirnames[:]
+            continue
+        visited.add(key)
+        folder_mtimes[directory] = st.st_mtime_ns
+
+        # Prune the folders that are not searched in-place so os.fwalk()
+        # does not descend into them.
+        subfolders = []
+        for name in dirnames:
+            state = _get_subfolder_state(name, depth, in_component)
+            if state is None:
+                continue
+            subfolders.append(name)
+            folders[os.path.join(directory, name)] = (depth + 1, state)
+        dirnames[:] = subfolders
+
+        filenames = [_i for _i in filenames if _i in NETCDF_FILENAMES]
+        if not filenames:
+            continue
+        # At most one file per folder.
+        found_files.append(
+            os.path.join(directory, sorted(filenames, reverse=True)[0])
+        )
+
+    return found_files, folder_mtimes
+
+
+# os.fwalk() is not available on all platforms, e.g. Windows.
+if hasattr(os, "fwalk"):
+    _find_netcdf_files = _find_netcdf_files_fwalk
+else:  # pragma: no cover
+    _find_netcdf_files = _find_netcdf_files_scandir
+
+
+def _list_database_folder(path):
+    """
+    Sorted names in the database folder without the layout cache and its
+    temporary files.
+    """
+    return sorted(
+        _i for _i in os.listdir(path) if not _i.startswith(".instaseis_")
+    )
+
+
+def _read_layout_cache(path):
+    """
+    Get the list of netCDF files from the layout cache in path.
+
+    Returns None if there is no valid cache. The cache is valid as long as
+    the database folder contains the same names, no other searched folder
+    has been modified, and all listed files still exist.
+    """
+    cache_file = os.path.join(path, LAYOUT_CACHE_FILENAME)
+    try:
+        with io.open(cache_file, "rt") as fh:
+            layout = json.load(fh)
+        # Writing the cache changes the modification time of the database
+        # folder itself so its content is compared instead.
+        if _list_database_folder(path) != layout["entries"]:
+            return None
+        for folder, mtime in layout["folders"].items():
+            if os.stat(os.path.join(path, folder)).st_mtime_ns != mtime:
+                return None
+        found_files = [os.path.join(path, _i) for _i in layout["files"]]
+    except Exception:
+        return None
+    if not found_files or not all(os.path.isfile(_i) for _i in found_files):
+        return None
+    return found_files
+
+
+def _write_layout_cache(path, found_files, folder_mtimes, search_start_ns):
+    """
+    Atomically write the list of found netCDF files to the layout cache in
+    path.
+
+    :param path: The searched database folder.
+    :param found_files: The found netCDF files.
+    :param folder_mtimes: The modification times of all searched folders
+        as returned by the search.
+    :param search_start_ns: The time in nanoseconds at which the search
+        started.
+
+    Nothing is written if any searched folder has been modified shortly
+    before or during the search. A later change within the same timestamp
+    tick would not alter the modification time so the cache could not
+    detect it. Two seconds is the coarsest resolution of common file
+    systems.
+
+    Failures, e.g. due to a read-only database folder, are silently ignored.
+    """
+    cache_file = os.path.join(path, LAYOUT_CACHE_FILENAME)
+    try:
+        if max(folder_mtimes.values()) >= search_start_ns - 2 * 10 ** 9:
+            return
+        # The database folder must still be unchanged for its content to be
+        # the one that has been searched.
+        if os.stat(path).st_mtime_ns != folder_mtimes[path]:
+            return
+        layout = {
+            "files": [os.path.relpath(_i, path) for _i in found_files],
+            "entries": _list_database_folder(path),
+            "folders": {
+                os.path.relpath(_i, path): mtime
+                for _i, mtime in folder_mtimes.items()
+                if _i != path
+            },
+        }
+        fd, tmp_file = tempfile.mkstemp(dir=path, prefix=".instaseis_")
+        try:
+            with io.open(fd, "wt") as fh:
+                json.dump(layout, fh)
+            os.replace(tmp_file, cache_file)
+        except Exception:
+            os.remove(tmp_file)
+            raise
+    except Exception:
+        pass
+
 
 def find_and_open_files(path, *args, **kwargs):
     """
@@ -27,22 +285,12 @@ def find_and_open_files(path, *args, **kwargs):
     Will recursively search the path and return an instaseis database class
     if possible.
     """
-    found_files = []
-    for root, dirs, filenames in os.walk(path, followlinks=True):
-        # Limit depth of filetree traversal
-        nested_levels = os.path.relpath(root, path).split(os.path.sep)
-        if len(nested_levels) >= 4:
-            del dirs[:]
-        for filename in sorted(filenames, reverse=True):
-            if filename in [
-                "ordered_output.nc4",
-                "axisem_output.nc4",
-                "merged_output.nc4",
-            ]:
-                break
-        else:
-            continue
-        found_files.append(os.path.join(root, filename))
+    found_files = _read_layout_cache(path) if USE_LAYOUT_CACHE else None
+    is_cached = found_files is not None
+    if not is_cached:
+        # time.time_ns() requires Python 3.7.
+        search_start_ns = int(time.time() * 10 ** 9)
+        found_files, folder_mtimes = _find_netcdf_files(path)
 
     if len(found_files) == 0:
         raise InstaseisNotFoundError(
@@ -57,53 +305,53 @@ def find_and_open_files(path, *args, **kwargs):
     # Catch the merged file first because its easy.
     if len(found_files) == 1 and found_files[0].endswith("merged_output.nc4"):
         # Now we have to open the file and find the number of dimensions.
+        # The opened file is passed on to the database class so it is only
+        # opened once.
+        f = h5py.File(found_files[0], mode="r")
         try:
-            f = h5py.File(found_files[0], mode="r")
-            ds = f["/MergedSnapshots"]
-            dims = ds.shape[1]
-        finally:
-            # File closing seems to act up in the tests for maybe locking
-            # related reasons? If this proves an issue in production we'll
-            # have to look into alternative solutions.
+            dims = f["/MergedSnapshots"].shape[1]
+
+            if dims in (2, 3, 5):
+                db_class = ReciprocalMergedInstaseisDB
+            elif dims == 10:
+                db_class = ForwardMergedInstaseisDB
+            else:  # pragma: no cover
+                raise NotImplementedError
+
+            if USE_LAYOUT_CACHE and not is_cached:
+                _write_layout_cache(
+                    path, found_files, folder_mtimes, search_start_ns
+                )
+            return db_class(db_path=path, netcdf_file=f, *args, **kwargs)
+        except Exception:
+            # Don't keep the file open if the database cannot be created.
             try:
                 f.close()
             except Exception:  # pragma: no cover
                 pass
-
-        if dims in (2, 3, 5):
-            return ReciprocalMergedInstaseisDB(
-                db_path=path, netcdf_file=found_files[0], *args, **kwargs
-            )
-        elif dims == 10:
-            return ForwardMergedInstaseisDB(
-                db_path=path, netcdf_file=found_files[0], *args, **kwargs
-            )
-        else:  # pragma: no cover
-            raise NotImplementedError
+            raise
 
     # Parse to find the correct components.
-    netcdf_files = collections.defaultdict(list)
-    patterns = ["PX", "PZ", "MZZ", "MXX_P_MYY", "MXZ_MYZ", "MXY_MXX_M_MYY"]
+    netcdf_files = {}
     for filename in found_files:
         s = os.path.relpath(filename, path).split(os.path.sep)
-        for p in patterns:
-            if p in s:
-                netcdf_files[p].append(filename)
-
-    # Assert at most one file per type.
-    for key, files in netcdf_files.items():
-        if len(files) != 1:
-            raise InstaseisError(
-                "Found %i files for component %s:\n\t%s"
-                % (len(files), key, "\n\t".join(files))
-            )
-        netcdf_files[key] = files[0]
+        for p in COMPONENT_FOLDERS.intersection(s):
+            # Assert at most one file per type.
+            if p in netcdf_files:
+                files = [
+                    _i
+                    for _i in found_files
+                    if p in os.path.relpath(_i, path).split(os.path.sep)
+                ]
+                raise InstaseisError(
+                    "Found %i files for component %s:\n\t%s"
+                    % (len(files), p, "\n\t".join(files))
+                )
+            netcdf_files[p] = filename
 
     # Two valid cases.
     if "PX" in netcdf_files or "PZ" in netcdf_files:
-        return ReciprocalInstaseisDB(
-            db_path=path, netcdf_files=netcdf_files, *args, **kwargs
-        )
+        db_class = ReciprocalInstaseisDB
     elif (
         "MZZ" in netcdf_files
         or "MXX_P_MYY" in netcdf_files
@@ -117,9 +365,7 @@ def find_and_open_files(path, *args, **kwargs):
                 "Expecting all four elemental moment tensor subfolders "
                 "to be present."
             )
-        return ForwardInstaseisDB(
-            db_path=path, netcdf_files=netcdf_files, *args, **kwargs
-        )
+        db_class = ForwardInstaseisDB
     else:
         raise InstaseisError(
             "Could not find any suitable netCDF files. Did you pass the "
@@ -127,3 +373,7 @@ def find_and_open_files(path, *args, **kwargs):
             "are located in '/path/to/PZ/Data', please pass '/path/to/' "
             "to Instaseis."
         )
+
+    if USE_LAYOUT_CACHE and not is_cached:
+        _write_layout_cache(path, found_files, folder_mtimes, search_start_ns)
+    return db_class(db_path=path, netcdf_files=netcdf_files, *args, **kwargs)
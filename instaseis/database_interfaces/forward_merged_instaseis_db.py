@@ -37,8 +37,9 @@ class ForwardMergedInstaseisDB(BaseNetCDFInstaseisDB):
         """
         :param db_path: Path to the Instaseis Database.
         :type db_path: str
-        :param netcdf_file: The path to the actual netcdf4 file.
-        :type netcdf_file: str
+        :param netcdf_file: The path to the actual netcdf4 file or the
+            already opened file.
+        :type netcdf_file: str or :class:`h5py.File`
         :param buffer_size_in_mb: Strain and displacement are buffered to
             avoid repeated disc access. Depending on the type of database
             and the number of components of the database, the total buffer
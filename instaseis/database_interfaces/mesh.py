@@ -134,8 +134,13 @@ class Mesh(object):
         displ_buffer_size_in_mb=0,
         read_on_demand=True,
     ):
-        self.f = h5py.File(filename, "r")
-        self.filename = filename
+        # Also accept an already opened file to avoid opening it twice.
+        if isinstance(filename, h5py.File):
+            self.f = filename
+            self.filename = filename.filename
+        else:
+            self.f = h5py.File(filename, "r")
+            self.filename = filename
         self.read_on_demand = read_on_demand
         self._parse(full_parse=full_parse)
         self._find_time_axis()
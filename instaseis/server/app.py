@@ -16,6 +16,7 @@ import tornado.ioloop
 import tornado.web
 
 from ..database_interfaces import find_and_open_files
+from .instaseis_request import get_etag_key
 
 from .routes.coordinates import CoordinatesHandler
 from .routes.events import EventHandler
@@ -92,6 +93,7 @@ def launch_io_loop(
     application.db = find_and_open_files(
         path=db_path, buffer_size_in_mb=buffer_size_in_mb
     )
+    application.etag_key = get_etag_key(application.db)
     application.station_coordinates_callback = station_coordinates_callback
     application.event_info_callback = event_info_callback
 
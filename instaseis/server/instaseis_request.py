@@ -10,13 +10,77 @@ Base Instaseis Request handler currently only settings default headers.
     (http://www.gnu.org/copyleft/lgpl.html)
 """
 from abc import ABCMeta, abstractmethod
+import datetime
+import functools
+import hashlib
+import re
+
 import obspy
-import tornado
+import tornado.web
 from ..database_interfaces.base_instaseis_db import _get_seismogram_times
 from .. import Receiver, FiniteSource
 
 from .. import __version__
 
+# Module level aliases to save the attribute lookups in the request handlers.
+_HTTPError = tornado.web.HTTPError
+_UTCDateTime = obspy.UTCDateTime
+_AttribDict = obspy.core.AttribDict
+
+
+# The results for these parameters depend on server callbacks whose
+# results can change while the server is running.
+_CALLBACK_PARAMETERS = frozenset(("eventid", "network", "station"))
+
+# Strings fully matching these patterns can be converted to the respective
+# type without having to guard against exceptions.
+_SAFE_CONVERSION_PATTERNS = {
+    int: re.compile(r"-?\d+"),
+    float: re.compile(r"-?(\d+\.?\d*|\.\d+)"),
+}
+
+
+@functools.lru_cache(maxsize=128)
+def _get_relative_seismogram_times(
+    db_dt, npts, src_shift, src_shift_samples, dt, kernelwidth
+):
+    """
+    Get the start- and endtime of seismograms relative to the origin time
+    in nanoseconds.
+
+    Cached as these only depend on a few database properties as well as
+    the desired sampling rate and the interpolation kernel width.
+    """
+    ti = _get_seismogram_times(
+        info=_AttribDict(
+            dt=db_dt,
+            npts=npts,
+            src_shift=src_shift,
+            src_shift_samples=src_shift_samples,
+        ),
+        origin_time=_UTCDateTime(ns=0),
+        dt=dt,
+        kernelwidth=kernelwidth,
+        remove_source_shift=False,
+        reconvolve_stf=False,
+    )
+    return ti["starttime"].ns, ti["endtime"].ns
+
+
+def get_etag_key(db):
+    """
+    Get the key for the ETags of the responses for the given database.
+
+    Derived from the Instaseis version and the database information so the
+    ETags change if either of them changes. Set it as the ``etag_key``
+    attribute of the application together with the database - otherwise it
+    is computed with the first request.
+    """
+    return hashlib.blake2b(
+        ("%s\n%r" % (__version__, sorted(db.info.items()))).encode(),
+        digest_size=16,
+    ).digest()
+
 
 class InstaseisRequestHandler(tornado.web.RequestHandler):
     def set_default_headers(self):
@@ -28,11 +92,53 @@ class InstaseisTimeSeriesHandler(InstaseisRequestHandler, metaclass=ABCMeta):
     arguments = None
     connection_closed = False
     default_label = ""
-    default_origin_time = obspy.UTCDateTime(0)
+    default_origin_time = _UTCDateTime(0)
+
+    # Content types and file endings of the supported output formats.
+    _CONTENT_TYPES = {
+        "miniseed": "application/vnd.fdsn.mseed",
+        "saczip": "application/zip",
+    }
+    _FILE_ENDINGS_MAP = {"miniseed": "mseed", "saczip": "zip"}
 
     def __init__(self, *args, **kwargs):
         super(InstaseisTimeSeriesHandler, self).__init__(*args, **kwargs)
 
+    def prepare(self):
+        """
+        Answer GET requests with 304 Not Modified if the client already has
+        the response.
+
+        The same request against the same database and Instaseis version
+        always results in the same seismograms so the ETag is derived from
+        the request URI and the ETag key of the application. Requests
+        depending on the event or station callbacks get no ETag as their
+        results can change while the server is running. The streamed
+        responses are not buffered so tornado cannot compute and check the
+        ETag on its own.
+
+        The ETag is weak as the responses are only semantically equal -
+        e.g. the files in SAC zip archives carry the time they have been
+        written.
+        """
+        if self.request.method != "GET":
+            return
+        if not _CALLBACK_PARAMETERS.isdisjoint(self.request.arguments):
+            return
+
+        application = self.application
+        etag_key = getattr(application, "etag_key", None)
+        if etag_key is None:
+            etag_key = application.etag_key = get_etag_key(application.db)
+
+        etag = hashlib.blake2b(
+            self.request.uri.encode(), digest_size=16, key=etag_key
+        ).hexdigest()
+        self.set_header("Etag", 'W/"%s"' % etag)
+        if self.check_etag_header():
+            self.set_status(304)
+            self.finish()
+
     def on_connection_close(self):  # pragma: no cover
         """
         Called when the client cancels the connection. Then the loop
@@ -41,68 +147,99 @@ class InstaseisTimeSeriesHandler(InstaseisRequestHandler, metaclass=ABCMeta):
         InstaseisRequestHandler.on_connection_close(self)
         self.__connection_closed = True
 
-    def parse_arguments(self):
-        # Make sure that no additional arguments are passed.
-        unknown_arguments = set(self.request.arguments.keys()).difference(
-            set(self.arguments.keys())
-        )
+    @classmethod
+    def _compile_arguments(cls):
+        """
+        Precompile the argument specification of the handler class.
 
-        # Remove the body arguments as they don't count.
-        unknown_arguments = unknown_arguments.difference(
-            set(self.request.body_arguments.keys())
-        )
+        Done once per class so the per request parsing only has to loop
+        over a tuple. The properties dictionary is kept as some defaults
+        are only known once the database is known and are set per request.
+        """
+        if "_compiled_args" not in cls.__dict__:
+            cls._compiled_args = tuple(
+                (
+                    name,
+                    "required" in properties,
+                    properties["type"],
+                    _SAFE_CONVERSION_PATTERNS.get(properties["type"]),
+                    properties.get("format"),
+                    properties,
+                )
+                for name, properties in cls.arguments.items()
+            )
+            cls._valid_names = frozenset(cls.arguments)
+        return cls._compiled_args
 
+    def parse_arguments(self):
+        compiled_args = self._compile_arguments()
+
+        # Make sure that no additional arguments are passed and that no
+        # argument is passed more than once.
+        request_arguments = self.request.arguments
+        unknown_arguments = request_arguments.keys() - self._valid_names
+        if unknown_arguments:
+            # Remove the body arguments as they don't count.
+            unknown_arguments -= self.request.body_arguments.keys()
         if unknown_arguments:
             msg = "The following unknown parameters have been passed: %s" % (
                 ", ".join("'%s'" % _i for _i in sorted(unknown_arguments))
             )
-            raise tornado.web.HTTPError(400, log_message=msg, reason=msg)
+            raise _HTTPError(400, log_message=msg, reason=msg)
 
-        # Check for duplicates.
-        duplicates = []
-        for key, value in self.request.arguments.items():
-            if len(value) == 1:
-                continue
-            else:
-                duplicates.append(key)
+        duplicates = [
+            key for key, value in request_arguments.items() if len(value) != 1
+        ]
         if duplicates:
             msg = "Duplicate parameters: %s" % (
                 ", ".join("'%s'" % _i for _i in sorted(duplicates))
             )
-            raise tornado.web.HTTPError(400, log_message=msg, reason=msg)
-
-        args = obspy.core.AttribDict()
-        for name, properties in self.arguments.items():
-            if "required" in properties:
-                try:
-                    value = self.get_argument(name)
-                except Exception:
-                    msg = "Required parameter '%s' not given." % name
-                    raise tornado.web.HTTPError(
-                        400, log_message=msg, reason=msg
-                    )
+            raise _HTTPError(400, log_message=msg, reason=msg)
+
+        args = _AttribDict()
+        for (
+            name,
+            required,
+            type_,
+            pattern,
+            format,
+            properties,
+        ) in compiled_args:
+            # Only let tornado parse the arguments that have actually been
+            # passed. The defaults are read per request as some of them
+            # depend on the database.
+            if name in request_arguments:
+                value = self.get_argument(name)
+            elif required:
+                msg = "Required parameter '%s' not given." % name
+                raise _HTTPError(400, log_message=msg, reason=msg)
+            else:
+                value = properties.get("default")
+            if value is None:
+                pass
+            # Fast paths for the common cases that cannot fail.
+            elif type_ is str:
+                value = str(value)
+            elif (
+                pattern is not None
+                and isinstance(value, str)
+                and pattern.fullmatch(value)
+            ):
+                value = type_(value)
             else:
-                if "default" in properties:
-                    default = properties["default"]
-                else:
-                    default = None
-                value = self.get_argument(name, default=default)
-            if value is not None:
                 try:
-                    value = properties["type"](value)
+                    value = type_(value)
                 except Exception:
-                    if "format" in properties:
+                    if format is not None:
                         msg = "Parameter '%s' must be formatted as: '%s'" % (
                             name,
-                            properties["format"],
+                            format,
                         )
                     else:
                         msg = (
                             "Parameter '%s' could not be converted to " "'%s'."
-                        ) % (name, str(properties["type"].__name__))
-                    raise tornado.web.HTTPError(
-                        400, log_message=msg, reason=msg
-                    )
+                        ) % (name, str(type_.__name__))
+                    raise _HTTPError(400, log_message=msg, reason=msg)
             setattr(args, name, value)
 
         # Validate some of them right here.
@@ -120,14 +257,14 @@ class InstaseisTimeSeriesHandler(InstaseisRequestHandler, metaclass=ABCMeta):
         if "components" in self.arguments:
             if len(args.components) > 5:
                 msg = "A maximum of 5 components can be requested."
-                raise tornado.web.HTTPError(400, log_message=msg, reason=msg)
+                raise _HTTPError(400, log_message=msg, reason=msg)
 
             if not args.components:
                 msg = (
                     "A request with no components will not return "
                     "anything..."
                 )
-                raise tornado.web.HTTPError(400, log_message=msg, reason=msg)
+                raise _HTTPError(400, log_message=msg, reason=msg)
 
         # Make sure the unit arguments is valid.
         if "units" in self.arguments:
@@ -137,14 +274,14 @@ class InstaseisTimeSeriesHandler(InstaseisRequestHandler, metaclass=ABCMeta):
                     "Unit must be one of 'displacement', 'velocity', "
                     "or 'acceleration'"
                 )
-                raise tornado.web.HTTPError(400, log_message=msg, reason=msg)
+                raise _HTTPError(400, log_message=msg, reason=msg)
 
         # Make sure the output format is valid.
         if "format" in self.arguments:
             args.format = args.format.lower()
-            if args.format not in ("miniseed", "saczip"):
+            if args.format not in self._CONTENT_TYPES:
                 msg = "Format must either be 'miniseed' or 'saczip'."
-                raise tornado.web.HTTPError(400, log_message=msg, reason=msg)
+                raise _HTTPError(400, log_message=msg, reason=msg)
 
         # If its essentially equal to the internal sampling rate just set it
         # to equal to ease the following comparisons.
@@ -161,7 +298,7 @@ class InstaseisTimeSeriesHandler(InstaseisRequestHandler, metaclass=ABCMeta):
                     "The smallest possible dt is 0.01. Please choose a "
                     "smaller value and resample locally if needed."
                 )
-                raise tornado.web.HTTPError(400, log_message=msg, reason=msg)
+                raise _HTTPError(400, log_message=msg, reason=msg)
 
             # Also make sure it does not downsample.
             if args.dt is not None and args.dt > info.dt:
@@ -170,7 +307,7 @@ class InstaseisTimeSeriesHandler(InstaseisRequestHandler, metaclass=ABCMeta):
                     "database is %.5f seconds. Make sure to choose a "
                     "smaller or equal one." % info.dt
                 )
-                raise tornado.web.HTTPError(400, log_message=msg, reason=msg)
+                raise _HTTPError(400, log_message=msg, reason=msg)
 
         if "kernelwidth" in self.arguments:
             # Make sure the interpolation kernel width is sensible. Don't allow
@@ -180,7 +317,7 @@ class InstaseisTimeSeriesHandler(InstaseisRequestHandler, metaclass=ABCMeta):
                     "`kernelwidth` must not be smaller than 1 or larger "
                     "than 20."
                 )
-                raise tornado.web.HTTPError(400, log_message=msg, reason=msg)
+                raise _HTTPError(400, log_message=msg, reason=msg)
 
     @abstractmethod
     def validate_parameters(self, args):
@@ -206,66 +343,81 @@ class InstaseisTimeSeriesHandler(InstaseisRequestHandler, metaclass=ABCMeta):
             args.origintime = self.default_origin_time
 
         # The origin time will be always set. If the starttime is not set,
-        # set it to the origin time.
+        # set it to the origin time. If it is a float, treat it relative to
+        # the origin time. Otherwise it is either an absolute or a phase
+        # relative time. The parsed time settings always have exactly one
+        # of these types so the type is only determined once.
+        starttime_type = type(args.starttime)
         if args.starttime is None:
             args.starttime = args.origintime
-
-        # Now it becomes a bit ugly. If the starttime is a float, treat it
-        # relative to the origin time.
-        if isinstance(args.starttime, float):
+            absolute_starttime = True
+        elif starttime_type is float:
             args.starttime = args.origintime + args.starttime
+            absolute_starttime = True
+        else:
+            absolute_starttime = starttime_type is _UTCDateTime
 
         # Now deal with the endtime.
-        if isinstance(args.endtime, float):
+        endtime_type = type(args.endtime)
+        if endtime_type is float:
             # If the start time is already known as an absolute time,
             # just add it.
-            if isinstance(args.starttime, obspy.UTCDateTime):
+            if absolute_starttime:
                 args.endtime = args.starttime + args.endtime
+                absolute_endtime = True
             # Otherwise the start time has to be a phase relative time and
             # is dealt with later.
             else:
-                assert isinstance(args.starttime, obspy.core.AttribDict)
+                assert starttime_type is _AttribDict
+                absolute_endtime = False
+        else:
+            absolute_endtime = endtime_type is _UTCDateTime
 
         # Figure out the maximum temporal range of the seismograms.
-        ti = _get_seismogram_times(
-            info=self.application.db.info,
-            origin_time=args.origintime,
+        info = self.application.db.info
+        rel_starttime, rel_endtime = _get_relative_seismogram_times(
+            db_dt=info.dt,
+            npts=info.npts,
+            src_shift=info.src_shift,
+            src_shift_samples=info.src_shift_samples,
             dt=args.dt,
             kernelwidth=args.kernelwidth,
-            remove_source_shift=False,
-            reconvolve_stf=False,
         )
+        origin_time_ns = args.origintime.ns
+        ti_starttime = _UTCDateTime(ns=origin_time_ns + rel_starttime)
+        ti_endtime = _UTCDateTime(ns=origin_time_ns + rel_endtime)
 
-        # If the endtime is not set, do it here.
+        # If the endtime is not set, do it here. It is trivially within the
+        # seismogram window.
         if args.endtime is None:
-            args.endtime = ti["endtime"]
+            args.endtime = ti_endtime
 
         # Do a couple of sanity checks here.
-        if isinstance(args.starttime, obspy.UTCDateTime):
+        if absolute_starttime:
             # The desired seismogram start time must be before the end time of
             # the seismograms.
-            if args.starttime >= ti["endtime"]:
+            if args.starttime >= ti_endtime:
                 msg = "The `starttime` must be before the seismogram ends."
-                raise tornado.web.HTTPError(400, log_message=msg, reason=msg)
+                raise _HTTPError(400, log_message=msg, reason=msg)
             # Arbitrary limit: The starttime can be at max one hour before the
             # origin time.
-            if args.starttime < (ti["starttime"] - 3600):
+            if args.starttime < (ti_starttime - 3600):
                 msg = (
                     "The seismogram can start at the maximum one hour "
                     "before the origin time."
                 )
-                raise tornado.web.HTTPError(400, log_message=msg, reason=msg)
+                raise _HTTPError(400, log_message=msg, reason=msg)
 
-        if isinstance(args.endtime, obspy.UTCDateTime):
+        if absolute_endtime:
             # The endtime must be within the seismogram window
-            if not (ti["starttime"] <= args.endtime <= ti["endtime"]):
+            if not (ti_starttime <= args.endtime <= ti_endtime):
                 msg = (
                     "The end time of the seismograms lies outside the "
                     "allowed range."
                 )
-                raise tornado.web.HTTPError(400, log_message=msg, reason=msg)
+                raise _HTTPError(400, log_message=msg, reason=msg)
 
-        return ti["starttime"], ti["endtime"]
+        return ti_starttime, ti_endtime
 
     def set_headers(self, args):
         if "format" not in args:
@@ -273,24 +425,25 @@ class InstaseisTimeSeriesHandler(InstaseisRequestHandler, metaclass=ABCMeta):
         else:
             format = args.format
 
-        if format == "miniseed":
-            content_type = "application/vnd.fdsn.mseed"
-        elif format == "saczip":
-            content_type = "application/zip"
-        self.set_header("Content-Type", content_type)
+        try:
+            content_type = self._CONTENT_TYPES[format]
+            file_ending = self._FILE_ENDINGS_MAP[format]
+        except KeyError:
+            msg = "Unknown format: %s" % format
+            raise _HTTPError(400, log_message=msg, reason=msg)
 
-        file_endings_map = {"miniseed": "mseed", "saczip": "zip"}
+        self.set_header("Content-Type", content_type)
 
         if "label" in args and args.label:
             label = args.label
         else:
             label = self.default_label
 
-        filename = "%s_%s.%s" % (
-            label,
-            str(obspy.UTCDateTime()).replace(":", "_"),
-            file_endings_map[format],
+        # Same format as str(_UTCDateTime()) but without colons.
+        timestamp = datetime.datetime.now(datetime.timezone.utc).strftime(
+            "%Y-%m-%dT%H_%M_%S.%fZ"
         )
+        filename = "%s_%s.%s" % (label, timestamp, file_ending)
 
         self.set_header(
             "Content-Disposition", "attachment; filename=%s" % filename
@@ -299,7 +452,7 @@ class InstaseisTimeSeriesHandler(InstaseisRequestHandler, metaclass=ABCMeta):
     def get_ttime(self, source, receiver, phase):
         if self.application.travel_time_callback is None:
             msg = "Server does not support travel time calculations."
-            raise tornado.web.HTTPError(404, log_message=msg, reason=msg)
+            raise _HTTPError(404, log_message=msg, reason=msg)
 
         # Finite sources will perform these calculations with the hypocenter.
         if isinstance(source, FiniteSource):
@@ -325,12 +478,13 @@ class InstaseisTimeSeriesHandler(InstaseisRequestHandler, metaclass=ABCMeta):
             )
         except ValueError as e:
             err_msg = str(e)
-            if err_msg.lower().startswith("invalid phase name"):
+            # Only lowercase the part of the message that is compared.
+            if err_msg[:18].lower() == "invalid phase name":
                 msg = "Invalid phase name: %s" % phase
             # This is just a safeguard - its save to not coverage test it.
             else:  # pragma: no cover
                 msg = "Failed to calculate travel time due to: %s" % err_msg
-            raise tornado.web.HTTPError(400, log_message=msg, reason=msg)
+            raise _HTTPError(400, log_message=msg, reason=msg)
         return tt
 
     def validate_geometry(self, source, receiver):
@@ -356,28 +510,22 @@ class InstaseisTimeSeriesHandler(InstaseisRequestHandler, metaclass=ABCMeta):
                         "Receiver must be at the surface for reciprocal "
                         "databases."
                     )
-                    raise tornado.web.HTTPError(
-                        400, log_message=msg, reason=msg
-                    )
+                    raise _HTTPError(400, log_message=msg, reason=msg)
             # Source depth must be within the allowed range.
-            if not (
-                (info.planet_radius - info.max_radius)
-                <= src_depth_in_m
-                <= (info.planet_radius - info.min_radius)
-            ):
+            planet_radius = info.planet_radius
+            min_depth = planet_radius - info.max_radius
+            max_depth = planet_radius - info.min_radius
+            if not (min_depth <= src_depth_in_m <= max_depth):
                 msg = (
                     "Source depth must be within the database range: %.1f "
                     "- %.1f meters."
-                ) % (
-                    info.planet_radius - info.max_radius,
-                    info.planet_radius - info.min_radius,
-                )
-                raise tornado.web.HTTPError(400, log_message=msg, reason=msg)
+                ) % (min_depth, max_depth)
+                raise _HTTPError(400, log_message=msg, reason=msg)
         else:
             # The source depth must coincide with the one in the database.
             if src_depth_in_m != info.source_depth * 1000:
                 msg = "Source depth must be: %.1f km" % info.source_depth
-                raise tornado.web.HTTPError(400, log_message=msg, reason=msg)
+                raise _HTTPError(400, log_message=msg, reason=msg)
 
     def get_phase_relative_times(
         self, args, source, receiver, min_starttime, max_endtime
@@ -389,7 +537,7 @@ class InstaseisTimeSeriesHandler(InstaseisRequestHandler, metaclass=ABCMeta):
         Returns None in case there either is no phase at the
         requested distance or it arrives too late, early for other settings.
         """
-        if isinstance(args.starttime, obspy.core.AttribDict):
+        if isinstance(args.starttime, _AttribDict):
             tt = self.get_ttime(
                 source=source, receiver=receiver, phase=args.starttime["phase"]
             )
@@ -402,7 +550,7 @@ class InstaseisTimeSeriesHandler(InstaseisRequestHandler, metaclass=ABCMeta):
         if starttime < min_starttime - 3600.0:
             return
 
-        if isinstance(args.endtime, obspy.core.AttribDict):
+        if isinstance(args.endtime, _AttribDict):
             tt = self.get_ttime(
                 source=source, receiver=receiver, phase=args.endtime["phase"]
             )
@@ -447,7 +595,7 @@ class InstaseisTimeSeriesHandler(InstaseisRequestHandler, metaclass=ABCMeta):
                     "Could not construct receiver with passed parameters. "
                     "Check parameters for sanity."
                 )
-                raise tornado.web.HTTPError(400, log_message=msg, reason=msg)
+                raise _HTTPError(400, log_message=msg, reason=msg)
             receivers.append(receiver)
         # Or a list of receivers.
         elif args.network is not None and args.station is not None:
@@ -460,7 +608,7 @@ class InstaseisTimeSeriesHandler(InstaseisRequestHandler, metaclass=ABCMeta):
 
             if not coordinates:
                 msg = "No coordinates found satisfying the query."
-                raise tornado.web.HTTPError(404, log_message=msg, reason=msg)
+                raise _HTTPError(404, log_message=msg, reason=msg)
 
             for station in coordinates:
                 try:
@@ -478,9 +626,7 @@ class InstaseisTimeSeriesHandler(InstaseisRequestHandler, metaclass=ABCMeta):
                         "Station coordinate query returned invalid "
                         "coordinates."
                     )
-                    raise tornado.web.HTTPError(
-                        400, log_message=msg, reason=msg
-                    )
+                    raise _HTTPError(400, log_message=msg, reason=msg)
         return receivers
 
     def validate_receiver_parameters(self, args):
@@ -491,16 +637,16 @@ class InstaseisTimeSeriesHandler(InstaseisRequestHandler, metaclass=ABCMeta):
         # of letters.
         if args.stationcode and len(args.stationcode) > 5:
             msg = "'stationcode' must have 5 or fewer letters."
-            raise tornado.web.HTTPError(400, log_message=msg, reason=msg)
+            raise _HTTPError(400, log_message=msg, reason=msg)
 
         if args.networkcode and len(args.networkcode) > 2:
             msg = "'networkcode' must have 2 or fewer letters."
-            raise tornado.web.HTTPError(400, log_message=msg, reason=msg)
+            raise _HTTPError(400, log_message=msg, reason=msg)
 
         # The location code as well.
         if args.locationcode and len(args.locationcode) > 2:
             msg = "'locationcode' must have 2 or fewer letters."
-            raise tornado.web.HTTPError(400, log_message=msg, reason=msg)
+            raise _HTTPError(400, log_message=msg, reason=msg)
 
         # Figure out who the station coordinates are specified.
         direct_receiver_settings = [
@@ -514,13 +660,13 @@ class InstaseisTimeSeriesHandler(InstaseisRequestHandler, metaclass=ABCMeta):
                 "the coordinates, or by specifying query parameters, "
                 "but not both."
             )
-            raise tornado.web.HTTPError(400, log_message=msg, reason=msg)
+            raise _HTTPError(400, log_message=msg, reason=msg)
         elif not (all(direct_receiver_settings) or all(query_receivers)):
             msg = (
                 "Must specify a full set of coordinates or a full set of "
                 "receiver parameters."
             )
-            raise tornado.web.HTTPError(400, log_message=msg, reason=msg)
+            raise _HTTPError(400, log_message=msg, reason=msg)
 
         # Should not happen.
         assert not (all(direct_receiver_settings) and all(query_receivers))
@@ -535,4 +681,4 @@ class InstaseisTimeSeriesHandler(InstaseisRequestHandler, metaclass=ABCMeta):
                 "Server does not support station coordinates and thus no "
                 "station queries."
             )
-            raise tornado.web.HTTPError(404, log_message=msg, reason=msg)
+            raise _HTTPError(404, log_message=msg, reason=msg)
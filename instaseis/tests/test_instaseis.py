@@ -18,10 +18,19 @@ import obspy
 import os
 import pytest
 import shutil
+import time
 
 import instaseis
 from instaseis import InstaseisError, InstaseisNotFoundError
-from instaseis.database_interfaces import find_and_open_files
+from instaseis.database_interfaces import (
+    COMPONENT_FOLDERS,
+    find_and_open_files,
+    _find_netcdf_files,
+    _find_netcdf_files_fwalk,
+    _find_netcdf_files_scandir,
+    _read_layout_cache,
+    _write_layout_cache,
+)
 from instaseis.database_interfaces.base_instaseis_db import (
     _get_seismogram_times,
 )
@@ -71,6 +80,17 @@ for name, path in _CONFIG_DBS["databases"].items():
 
 BW_DISPL_DBS = [_i for _i in DBS if "_db_bwd_displ_" in _i]
 
+# Both implementations of the search for the netCDF files.
+FIND_NETCDF_FILES_FUNCTIONS = [
+    _find_netcdf_files_scandir,
+    pytest.param(
+        _find_netcdf_files_fwalk,
+        marks=pytest.mark.skipif(
+            not hasattr(os, "fwalk"), reason="os.fwalk() not available"
+        ),
+    ),
+]
+
 
 @pytest.mark.parametrize("bwd_db", BW_DISPL_DBS)
 def test_fwd_vs_bwd(bwd_db):
@@ -2169,6 +2189,260 @@ def test_failures_when_opening_databases(tmpdir):
     )
 
 
+@pytest.mark.parametrize("find_files", FIND_NETCDF_FILES_FUNCTIONS)
+def test_maximum_search_depth(tmpdir, find_files):
+    """
+    Files up to four folders below the database folder are found.
+    """
+    folder = os.path.join(tmpdir.strpath, "PX", "Data", "Data", "Data")
+    f = os.path.join(folder, "ordered_output.nc4")
+    os.makedirs(folder)
+    with io.open(f, "wb") as fh:
+        fh.write(b" ")
+    assert find_files(tmpdir.strpath)[0] == [f]
+
+    # One level deeper is no longer searched.
+    os.makedirs(os.path.join(folder, "Data"))
+    os.rename(f, os.path.join(folder, "Data", "ordered_output.nc4"))
+    assert find_files(tmpdir.strpath)[0] == []
+
+
+@pytest.mark.parametrize("find_files", FIND_NETCDF_FILES_FUNCTIONS)
+def test_searched_database_layouts(tmpdir, find_files):
+    """
+    Merged databases and component databases are found in any folder up to
+    the maximum search depth.
+    """
+    for folder in [
+        ("run", "output"),
+        ("a", "b", "c", "d"),
+        ("x", "20s_PREM", "PZ", "Data"),
+        ("PX",),
+    ]:
+        root = os.path.join(tmpdir.strpath, *folder)
+        filename = (
+            "ordered_output.nc4"
+            if COMPONENT_FOLDERS.intersection(folder)
+            else "merged_output.nc4"
+        )
+        f = os.path.join(root, filename)
+        os.makedirs(root)
+        with io.open(f, "wb") as fh:
+            fh.write(b" ")
+        assert find_files(tmpdir.strpath)[0] == [f]
+        shutil.rmtree(os.path.join(tmpdir.strpath, folder[0]))
+
+
+@pytest.mark.parametrize("find_files", FIND_NETCDF_FILES_FUNCTIONS)
+def test_hidden_and_unrelated_folders_are_not_searched(tmpdir, find_files):
+    """
+    Hidden folders and folders below a component folder other than 'Data'
+    are not searched for netCDF files.
+    """
+    for filename in [
+        (".git", "PX", "ordered_output.nc4"),
+        ("1", ".snapshot", "PX", "ordered_output.nc4"),
+        ("PX", "Info", "ordered_output.nc4"),
+        ("PZ", "Data", "Info", "ordered_output.nc4"),
+        ("1", "PX", "Code", "merged_output.nc4"),
+    ]:
+        f = os.path.join(tmpdir.strpath, *filename)
+        os.makedirs(os.path.dirname(f))
+        with io.open(f, "wb") as fh:
+            fh.write(b" ")
+
+    assert find_files(tmpdir.strpath)[0] == []
+
+
+@pytest.mark.parametrize("find_files", FIND_NETCDF_FILES_FUNCTIONS)
+def test_folders_are_searched_only_once(tmpdir, find_files):
+    """
+    Folders reachable via multiple symbolic links are only searched once.
+    """
+    path = os.path.join(tmpdir.strpath, "a")
+    f = os.path.join(path, "PX", "Data", "ordered_output.nc4")
+    os.makedirs(os.path.dirname(f))
+    with io.open(f, "wb") as fh:
+        fh.write(b" ")
+
+    os.makedirs(os.path.join(path, "1"))
+    os.symlink(os.path.join(path, "PX"), os.path.join(path, "1", "PX"))
+    # Recursive link.
+    os.symlink(path, os.path.join(path, "1", "loop"))
+
+    assert find_files(path)[0] == [f]
+
+    # A link to a component folder under another name must not hide the
+    # component folder, no matter which one is searched first.
+    path = os.path.join(tmpdir.strpath, "b")
+    files = [
+        os.path.join(path, _i, "Data", "ordered_output.nc4")
+        for _i in ("PX", "PZ")
+    ]
+    for f in files:
+        os.makedirs(os.path.dirname(f))
+        with io.open(f, "wb") as fh:
+            fh.write(b" ")
+    os.symlink(os.path.join(path, "PX"), os.path.join(path, "zzz"))
+    os.symlink(os.path.join(path, "PX"), os.path.join(path, "AAA"))
+
+    found_files = find_files(path)[0]
+    assert set(files).issubset(found_files)
+
+
+@pytest.mark.parametrize("find_files", FIND_NETCDF_FILES_FUNCTIONS)
+def test_searching_missing_paths_and_files(tmpdir, find_files, monkeypatch):
+    """
+    Paths that do not exist or are not folders contain no database.
+    """
+    monkeypatch.setattr(
+        instaseis.database_interfaces, "_find_netcdf_files", find_files
+    )
+    f = os.path.join(tmpdir.strpath, "ordered_output.nc4")
+    with io.open(f, "wb") as fh:
+        fh.write(b" ")
+
+    for path in [os.path.join(tmpdir.strpath, "random"), f]:
+        assert find_files(path) == ([], {})
+        with pytest.raises(InstaseisNotFoundError) as err:
+            find_and_open_files(path)
+        assert err.value.args[0].startswith("No suitable netCDF files")
+
+
+def _now_ns():
+    """
+    The current time in nanoseconds - time.time_ns() requires Python 3.7.
+    """
+    return int(time.time() * 10 ** 9)
+
+
+def _age_folders(path):
+    """
+    Move the modification time of path and all folders below it one hour
+    into the past.
+    """
+    for root, _, _ in os.walk(path):
+        st = os.stat(root)
+        os.utime(root, ns=(st.st_atime_ns, st.st_mtime_ns - 3600 * 10 ** 9))
+
+
+def test_layout_cache(tmpdir):
+    """
+    Tests the cache of the locations of the netCDF files of a database.
+    """
+    path = tmpdir.strpath
+    cache_file = os.path.join(path, ".instaseis_layout.json")
+    files = [
+        os.path.join(path, _i, "Data", "ordered_output.nc4")
+        for _i in ("PX", "PZ")
+    ]
+    for f in files:
+        os.makedirs(os.path.dirname(f))
+        with io.open(f, "wb") as fh:
+            fh.write(b" ")
+
+    # Not written if the folders have only just been modified.
+    found_files, folder_mtimes = _find_netcdf_files(path)
+    assert sorted(found_files) == files
+    _write_layout_cache(path, found_files, folder_mtimes, _now_ns())
+    assert not os.path.exists(cache_file)
+    assert _read_layout_cache(path) is None
+
+    _age_folders(path)
+    found_files, folder_mtimes = _find_netcdf_files(path)
+    _write_layout_cache(path, found_files, folder_mtimes, _now_ns())
+    assert _read_layout_cache(path) == found_files
+
+    # Invalid once the content of the database folder changes.
+    os.makedirs(os.path.join(path, "random"))
+    assert _read_layout_cache(path) is None
+    os.rmdir(os.path.join(path, "random"))
+    assert _read_layout_cache(path) == found_files
+
+    # Or once any other searched folder changes.
+    os.makedirs(os.path.join(path, "PX", "random"))
+    assert _read_layout_cache(path) is None
+
+    # Or once one of the files has been removed.
+    shutil.rmtree(os.path.join(path, "PX", "random"))
+    _age_folders(path)
+    found_files, folder_mtimes = _find_netcdf_files(path)
+    _write_layout_cache(path, found_files, folder_mtimes, _now_ns())
+    assert _read_layout_cache(path) == found_files
+    os.remove(files[0])
+    assert _read_layout_cache(path) is None
+
+
+def test_layout_cache_detects_repacked_files(tmpdir):
+    """
+    Repacked files next to the original files invalidate the layout cache.
+    """
+    path = tmpdir.strpath
+    for component in ("PX", "PZ"):
+        f = os.path.join(path, component, "Data", "axisem_output.nc4")
+        os.makedirs(os.path.dirname(f))
+        with io.open(f, "wb") as fh:
+            fh.write(b" ")
+    _age_folders(path)
+
+    found_files, folder_mtimes = _find_netcdf_files(path)
+    _write_layout_cache(path, found_files, folder_mtimes, _now_ns())
+    assert _read_layout_cache(path) == found_files
+
+    repacked_files = []
+    for f in found_files:
+        f = os.path.join(os.path.dirname(f), "ordered_output.nc4")
+        with io.open(f, "wb") as fh:
+            fh.write(b" ")
+        repacked_files.append(f)
+
+    assert _read_layout_cache(path) is None
+    assert sorted(_find_netcdf_files(path)[0]) == sorted(repacked_files)
+
+
+@pytest.mark.parametrize(
+    "database_folder",
+    [
+        os.path.join(DATA, "100s_db_bwd_displ_only"),
+        pytest.param(
+            _CONFIG_DBS["databases"].get("merged_100s_db_bwd_displ_only"),
+            marks=pytest.mark.skipif(
+                "merged_100s_db_bwd_displ_only"
+                not in _CONFIG_DBS["databases"],
+                reason="requires generated tests databases.",
+            ),
+        ),
+    ],
+)
+def test_find_and_open_files_uses_layout_cache(
+    database_folder, tmpdir, monkeypatch
+):
+    """
+    Opening a database again uses the layout cache written when it was first
+    opened instead of searching for the netCDF files.
+    """
+    # The test suite disables the layout cache.
+    monkeypatch.setattr(
+        instaseis.database_interfaces, "USE_LAYOUT_CACHE", True
+    )
+    path = os.path.join(tmpdir.strpath, "db")
+    shutil.copytree(database_folder, path)
+    _age_folders(path)
+
+    db = find_and_open_files(path)
+    assert os.path.exists(os.path.join(path, ".instaseis_layout.json"))
+
+    def _find_netcdf_files(path):  # pragma: no cover
+        raise AssertionError("The database has been searched again.")
+
+    monkeypatch.setattr(
+        instaseis.database_interfaces, "_find_netcdf_files", _find_netcdf_files
+    )
+    cached_db = find_and_open_files(path)
+    assert type(cached_db) is type(db)
+    assert str(cached_db) == str(db)
+
+
 @pytest.mark.parametrize("database_folder", DBS)
 @pytest.mark.parametrize("read_on_demand", [True, False])
 def test_read_on_demand(database_folder, read_on_demand):
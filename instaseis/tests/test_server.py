@@ -24,6 +24,7 @@ from .tornado_testing_fixtures import _assemble_url
 import instaseis
 from instaseis.helpers import geocentric_to_elliptic_latitude
 from instaseis.server import util
+from instaseis.server.instaseis_request import get_etag_key
 
 # Conditionally import mock either from the stdlib or as a separate library.
 import sys
@@ -6316,3 +6317,127 @@ def test_cache_is_not_modified(all_clients):
     params["kernelwidth"] = "2"
     params["units"] = "ACCELERATION"
     request_multiple_times("seismograms", params)
+
+
+def test_etag_and_not_modified(all_greens_clients):
+    """
+    Repeated requests with a matching If-None-Match header are answered
+    with 304 Not Modified.
+    """
+    client = all_greens_clients
+
+    params = {
+        "sourcelatitude": 10,
+        "sourcelongitude": 10,
+        "sourcedepthinmeters": client.source_depth,
+        "sourcemomenttensor": "100000,100000,100000,100000,100000,100000",
+        "receiverlatitude": 20,
+        "receiverlongitude": 20,
+        "format": "miniseed",
+    }
+
+    request = fetch_sync(client, _assemble_url("seismograms", **params))
+    assert request.code == 200
+    etag = request.headers["Etag"]
+    assert etag.startswith('W/"')
+
+    # Same request results in the same ETag.
+    request = fetch_sync(client, _assemble_url("seismograms", **params))
+    assert request.code == 200
+    assert request.headers["Etag"] == etag
+
+    # A matching If-None-Match header results in an empty 304 response.
+    request = fetch_sync(
+        client,
+        _assemble_url("seismograms", **params),
+        headers={"If-None-Match": etag},
+    )
+    assert request.code == 304
+    assert request.body == b""
+
+    # Different parameters result in a different ETag.
+    p = copy.deepcopy(params)
+    p["receiverlatitude"] = 21
+    request = fetch_sync(
+        client,
+        _assemble_url("seismograms", **p),
+        headers={"If-None-Match": etag},
+    )
+    assert request.code == 200
+    assert request.headers["Etag"] != etag
+
+    # Same for SAC zip archives, even though the files in them carry the
+    # time they have been written.
+    p = copy.deepcopy(params)
+    p["format"] = "saczip"
+    request = fetch_sync(client, _assemble_url("seismograms", **p))
+    assert request.code == 200
+    saczip_etag = request.headers["Etag"]
+    assert saczip_etag.startswith('W/"')
+    assert saczip_etag != etag
+    request = fetch_sync(
+        client,
+        _assemble_url("seismograms", **p),
+        headers={"If-None-Match": saczip_etag},
+    )
+    assert request.code == 304
+    assert request.body == b""
+
+    # Errors do not carry an ETag.
+    p = copy.deepcopy(params)
+    p["format"] = "random"
+    request = fetch_sync(client, _assemble_url("seismograms", **p))
+    assert request.code == 400
+    assert "Etag" not in request.headers
+
+
+def test_no_etag_for_requests_depending_on_callbacks(
+    reciprocal_clients_all_callbacks,
+):
+    """
+    Requests whose results depend on the event or station callbacks never
+    get an ETag as the callbacks' results can change.
+    """
+    client = reciprocal_clients_all_callbacks
+
+    params = {
+        "receiverlatitude": 10,
+        "receiverlongitude": 10,
+        "eventid": "B071791B",
+        "format": "miniseed",
+    }
+    request = fetch_sync(client, _assemble_url("seismograms", **params))
+    assert request.code == 200
+    assert "Etag" not in request.headers
+
+    params = {
+        "sourcelatitude": 10,
+        "sourcelongitude": 10,
+        "sourcedepthinmeters": client.source_depth,
+        "sourcemomenttensor": "100000,100000,100000,100000,100000,100000",
+        "network": "IU",
+        "station": "ANMO",
+        "format": "miniseed",
+    }
+    request = fetch_sync(client, _assemble_url("seismograms", **params))
+    assert request.code == 200
+    assert "Etag" not in request.headers
+
+
+def test_etag_key():
+    """
+    The ETag key changes with the database information and the Instaseis
+    version.
+    """
+    db = mock.Mock()
+    db.info = obspy.core.AttribDict(dt=1.0, npts=10)
+    key = get_etag_key(db)
+    assert len(key) == 16
+    assert get_etag_key(db) == key
+
+    db.info.npts = 11
+    assert get_etag_key(db) != key
+    db.info.npts = 10
+
+    with mock.patch("instaseis.server.instaseis_request.__version__", "0.0.0"):
+        assert get_etag_key(db) != key